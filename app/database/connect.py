@@ -20,6 +20,8 @@ class Settings(BaseSettings):
     MYSQLDB_HOST: Optional[str] = None
     MONGODB_HOST: Optional[str] = None
     KAFKA_HOST: Optional[str] = None
+    USE_NEIGHBOR_TABLE: bool = False
+    NEIGHBOR_TOP_K: int = 200
 
     class Config:
         env_file = ".env"
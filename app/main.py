@@ -13,6 +13,7 @@ from fastapi.responses import JSONResponse
 from jose import JWTError, jwt
 from resources import recommend_helper
 from routes import router
+from routes.apihelper.recommend_media_helper import get_singleflight_stats
 from sqlalchemy.ext.asyncio import close_all_sessions
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -20,7 +21,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await recommend_helper.init_data()
+    await recommend_helper.init_data(settings.USE_NEIGHBOR_TABLE, settings.NEIGHBOR_TOP_K)
     await mysql_conn.init_db()
     yield
     await close_all_sessions()
@@ -95,4 +96,4 @@ async def read_root():
 
 @app.get("/healthcheck")
 async def get_healthcheck():
-    return {"status": "OK"}
+    return {"status": "OK", "singleflight": get_singleflight_stats()}
@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from resources import neighbor_table_path, recommend_helper
+from resources.load_resource import Recommender
+from resources.neighbor_table import NeighborTable, build_neighbor_table
+
+
+def _top_titles(similar_contents, top_n):
+    return [
+        content
+        for content, _ in sorted(similar_contents.items(), key=lambda x: x[1], reverse=True)[:top_n]
+    ]
+
+
+def benchmark(recommender, samples=200, max_inputs=5, top_n=100, seed=0):
+    # 기존 전체 계산(_calculate_similarities_exact)과 이웃 테이블 계산의 속도와 결과를 비교한다
+    rng = random.Random(seed)
+    popular_content_embeddings_dict = recommender._get_popular_content_embeddings_dict(
+        {"input_media_title": []}
+    )
+    titles = list(recommender.contents_embedding.keys())
+
+    exact_time, table_time, recalls, max_diffs = 0.0, 0.0, [], []
+    for _ in range(samples):
+        preferred_contents = rng.sample(titles, rng.randint(1, max_inputs))
+        candidates = dict(popular_content_embeddings_dict)
+        for title in preferred_contents:
+            candidates[title] = recommender.contents_embedding[title]
+
+        start = time.perf_counter()
+        exact = recommender._calculate_similarities_exact(preferred_contents, candidates)
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = recommender._calculate_similarities_with_neighbors(preferred_contents, candidates)
+        table_time += time.perf_counter() - start
+
+        exact_top = _top_titles(exact, top_n)
+        approx_top = set(_top_titles(approx, top_n))
+        recalls.append(len(approx_top.intersection(exact_top)) / max(len(exact_top), 1))
+        max_diffs.append(
+            max((abs(exact[title] - approx[title]) for title in approx if title in exact), default=0)
+        )
+
+    print(f"samples: {samples}, top_n: {top_n}")
+    print(f"exact     : {exact_time / samples * 1000:.3f} ms/request")
+    print(f"neighbors : {table_time / samples * 1000:.3f} ms/request")
+    print(f"recall@{top_n}: mean {np.mean(recalls):.4f}, min {np.min(recalls):.4f}")
+    print(f"max score diff on shared titles: {np.max(max_diffs):.6f}")
+
+
+def _synthetic_recommender(n_titles=400, dim=32, n_clusters=8, seed=0):
+    # 실제 리소스 없이 검증할 수 있도록 군집 구조를 가진 임베딩을 만든다
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    titles = [f"title_{i}" for i in range(n_titles)]
+    recommender = Recommender(None, None, None, None)
+    recommender.contents_embedding = {
+        title: centers[i % n_clusters] + rng.normal(scale=0.8, size=dim)
+        for i, title in enumerate(titles)
+    }
+    recommender.contents = pd.DataFrame(
+        {"Title": titles, "Normalized Popularity Score": rng.random(n_titles)}
+    )
+    return recommender
+
+
+def check(top_k=20):
+    # 이웃 테이블 생성/저장/조회 경로가 전체 계산과 일치하는지 합성 데이터로 확인한다
+    recommender = _synthetic_recommender()
+    popular_content_embeddings_dict = recommender._get_popular_content_embeddings_dict(
+        {"input_media_title": []}
+    )
+    table = build_neighbor_table(
+        recommender.contents_embedding, popular_content_embeddings_dict.keys(), top_k=top_k
+    )
+
+    for title in table.titles:
+        neighbor_titles, _ = table.neighbors(title)
+        assert title not in neighbor_titles, f"{title} 이 자기 자신을 이웃으로 가집니다."
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "neighbors.npz")
+        table.save(path)
+        loaded = NeighborTable.load(path)
+    for name in ("titles", "indptr", "indices", "scores"):
+        assert np.array_equal(getattr(table, name), getattr(loaded, name)), f"{name} 불일치"
+    assert table.fingerprint == loaded.fingerprint, "fingerprint 불일치"
+    recommender.neighbor_table = loaded
+
+    # 인기 콘텐츠/비인기 콘텐츠 각각을 단일 입력으로 넣었을 때 상위 top_k 가 같아야 한다
+    popular_title = next(iter(popular_content_embeddings_dict))
+    other_title = next(t for t in table.titles if t not in popular_content_embeddings_dict)
+    for title in (popular_title, str(other_title)):
+        candidates = dict(popular_content_embeddings_dict)
+        candidates[title] = recommender.contents_embedding[title]
+        exact = recommender._calculate_similarities_exact([title], candidates)
+        approx = recommender._calculate_similarities_with_neighbors([title], candidates)
+        exact_top = _top_titles(exact, top_k)
+        assert set(exact_top) == set(approx), f"{title} 의 상위 {top_k} 가 다릅니다."
+        assert all(type(t) is str for t in approx), "이웃 테이블 결과의 키가 str 이 아닙니다."
+        assert np.allclose([exact[t] for t in exact_top], [approx[t] for t in exact_top], atol=1e-5)
+
+    # 테이블에 없는 콘텐츠는 전체 계산으로 대체되어야 한다
+    del loaded.title_index[popular_title]
+    candidates = dict(popular_content_embeddings_dict)
+    exact = recommender._calculate_similarities_exact([popular_title], candidates)
+    approx = recommender._calculate_similarities_with_neighbors([popular_title], candidates)
+    assert exact.keys() == approx.keys() and all(exact[t] == approx[t] for t in exact)
+
+    # 임베딩이 바뀌면 fingerprint 가 달라져서 테이블을 사용하지 않아야 한다
+    with tempfile.TemporaryDirectory() as directory:
+        recommender.neighbor_table_path = os.path.join(directory, "neighbors.npz")
+        table.save(recommender.neighbor_table_path)
+        assert recommender._load_neighbor_table(top_k) is not None
+        assert recommender._load_neighbor_table(top_k + 1) is None
+        recommender.contents_embedding[popular_title] = (
+            recommender.contents_embedding[popular_title] + 1
+        )
+        assert recommender._load_neighbor_table(top_k) is None
+
+        # 잘린 파일이나 fingerprint 가 없는 이전 형식도 예외 없이 전체 계산으로 대체되어야 한다
+        with open(recommender.neighbor_table_path, "r+b") as f:
+            f.truncate(100)
+        assert recommender._load_neighbor_table(top_k) is None
+        np.savez(
+            recommender.neighbor_table_path,
+            titles=table.titles,
+            indptr=table.indptr,
+            indices=table.indices,
+            scores=table.scores,
+        )
+        assert recommender._load_neighbor_table(top_k) is None
+        np.savez(recommender.neighbor_table_path, titles=table.titles)
+        assert recommender._load_neighbor_table(top_k) is None
+    print("이웃 테이블 검증을 통과했습니다.")
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="콘텐츠 이웃 테이블 생성 및 비교")
+    parser.add_argument("command", choices=["build", "benchmark", "check"])
+    # 런타임 Settings.NEIGHBOR_TOP_K 와 같은 환경 변수를 기본값으로 사용한다
+    parser.add_argument("--top-k", type=int, default=int(os.environ.get("NEIGHBOR_TOP_K", 200)))
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--output", default=neighbor_table_path)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        check()
+        return
+
+    if args.command == "build":
+        await recommend_helper.init_data()
+        candidate_titles = recommend_helper._get_popular_content_embeddings_dict(
+            {"input_media_title": []}
+        ).keys()
+        table = build_neighbor_table(
+            recommend_helper.contents_embedding, candidate_titles, top_k=args.top_k
+        )
+        table.save(args.output)
+        print(f"{len(table.titles)}개 콘텐츠의 이웃 테이블을 {args.output} 에 저장했습니다.")
+    else:
+        await recommend_helper.init_data(use_neighbor_table=True, neighbor_top_k=args.top_k)
+        if recommend_helper.neighbor_table is None:
+            raise SystemExit("이웃 테이블이 없습니다. build 를 먼저 실행하세요.")
+        benchmark(recommend_helper, samples=args.samples)
+
+
+# app 디렉터리에서 실행한다
+# python -m resources.build_neighbors build --top-k 200
+# python -m resources.build_neighbors benchmark --top-k 200
+# python -m resources.build_neighbors check
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,28 +1,34 @@
 import asyncio
+import os
 from concurrent.futures import ThreadPoolExecutor
 
 import joblib
 import numpy as np
 import pandas as pd
+from resources.neighbor_table import NeighborTable, table_fingerprint
 from sklearn.preprocessing import MinMaxScaler, StandardScaler
 
 
 class Recommender:
-    def __init__(self, mbti_embedding, contents_embedding, best_gbm, media_data):
+    def __init__(
+        self, mbti_embedding, contents_embedding, best_gbm, media_data, neighbor_table=None
+    ):
         self.media_data_path = media_data
         self.user_embedding_path = mbti_embedding
         self.contents_embedding_path = contents_embedding
         self.best_gbm_path = best_gbm
+        self.neighbor_table_path = neighbor_table
         self.media_data = None
         self.user_embedding = None
         self.contents_embedding = None
         self.best_gbm = None
+        self.neighbor_table = None
         self.contents = None
         self.genres = None
         self.cbf_model_input_scaled = None
         self.executor = ThreadPoolExecutor(max_workers=20)  # 비동기 작업을 위한 ThreadPoolExecutor
 
-    async def init_data(self):
+    async def init_data(self, use_neighbor_table=False, neighbor_top_k=200):
         await self._load_data()
         loop = asyncio.get_event_loop()
         self.contents = await loop.run_in_executor(self.executor, self._normalize_popularity_score)
@@ -30,6 +36,11 @@ class Recommender:
         self.cbf_model_input_scaled = await loop.run_in_executor(
             self.executor, self._scale_features
         )
+        # 인기 콘텐츠 목록은 popularity score 가 계산된 뒤에야 알 수 있으므로 마지막에 검증한다
+        if use_neighbor_table:
+            self.neighbor_table = await loop.run_in_executor(
+                self.executor, self._load_neighbor_table, neighbor_top_k
+            )
 
     def _read_csv_with_encoding(self, path):
         return pd.read_csv(path, encoding="utf-8-sig")
@@ -47,6 +58,30 @@ class Recommender:
             )
         )
 
+    def _load_neighbor_table(self, top_k):
+        # 오프라인으로 생성한 이웃 테이블이 현재 데이터로 만들어진 경우에만 사용한다
+        if not self.neighbor_table_path or not os.path.exists(self.neighbor_table_path):
+            print("이웃 테이블이 없어 전체 유사도 계산을 사용합니다.")
+            return None
+        try:
+            table = NeighborTable.load(self.neighbor_table_path)
+        except Exception as e:
+            # 잘린 파일이나 이전 형식의 파일도 서버 시작을 막지 않고 전체 계산으로 대체한다
+            print(f"이웃 테이블이 현재 데이터와 맞지 않아 사용하지 않습니다. ({e!r})")
+            return None
+        expected = table_fingerprint(
+            self.contents_embedding,
+            self._get_popular_content_embeddings_dict({"input_media_title": []}).keys(),
+            top_k,
+        )
+        if table.fingerprint != expected:
+            fingerprint = table.fingerprint if isinstance(table.fingerprint, dict) else {}
+            mismatched = [key for key in expected if fingerprint.get(key) != expected[key]]
+            print(f"이웃 테이블이 현재 데이터와 맞지 않아 사용하지 않습니다. ({', '.join(mismatched)})")
+            return None
+        print("이웃 테이블을 사용합니다.")
+        return table
+
     def _normalize_popularity_score(self):
         content = self.media_data[
             ["Title", "Genres", "Overview", "Rating Value", "Rating Count"]
@@ -96,18 +131,24 @@ class Recommender:
         return similar_contents[:top_n]
 
     def _calculate_similarities(self, preferred_contents, popular_content_embeddings_dict):
+        if self.neighbor_table is not None:
+            return self._calculate_similarities_with_neighbors(
+                preferred_contents, popular_content_embeddings_dict
+            )
+        return self._calculate_similarities_exact(
+            preferred_contents, popular_content_embeddings_dict
+        )
+
+    def _calculate_similarities_exact(self, preferred_contents, popular_content_embeddings_dict):
         similar_contents = {}
         for preferred_content in preferred_contents:
             if preferred_content in self.contents_embedding:
-                preferred_embedding = self.contents_embedding[preferred_content]
-                for other_content, embedding in popular_content_embeddings_dict.items():
-                    if other_content not in preferred_contents:
-                        similarity = similarity = np.dot(preferred_embedding, embedding) / (
-                            np.linalg.norm(preferred_embedding) * np.linalg.norm(embedding)
-                        )
-                        if other_content not in similar_contents:
-                            similar_contents[other_content] = 0
-                        similar_contents[other_content] += similarity
+                self._add_exact_similarities(
+                    preferred_content,
+                    preferred_contents,
+                    popular_content_embeddings_dict,
+                    similar_contents,
+                )
 
         # for content in preferred_contents:
         #     contents_embedding = self.contents_embedding[content]
@@ -121,6 +162,52 @@ class Recommender:
         #             similar_contents[other_content] += similarity
         return similar_contents
 
+    def _calculate_similarities_with_neighbors(
+        self, preferred_contents, popular_content_embeddings_dict
+    ):
+        # 이웃 테이블에 있는 콘텐츠는 저장된 상위 K개 유사도만 합산하고, 없는 콘텐츠는 전체 계산한다
+        similar_contents = {}
+        for preferred_content in preferred_contents:
+            if preferred_content not in self.contents_embedding:
+                continue
+            if preferred_content not in self.neighbor_table:
+                self._add_exact_similarities(
+                    preferred_content,
+                    preferred_contents,
+                    popular_content_embeddings_dict,
+                    similar_contents,
+                )
+                continue
+            titles, scores = self.neighbor_table.neighbors(preferred_content)
+            for other_content, similarity in zip(titles, scores):
+                if (
+                    other_content in popular_content_embeddings_dict
+                    and other_content not in preferred_contents
+                ):
+                    # 테이블의 numpy.str_ 를 str 로 바꿔서 전체 계산과 같은 키 타입을 반환한다
+                    other_content = str(other_content)
+                    similar_contents[other_content] = similar_contents.get(
+                        other_content, 0
+                    ) + float(similarity)
+        return similar_contents
+
+    def _add_exact_similarities(
+        self,
+        preferred_content,
+        preferred_contents,
+        popular_content_embeddings_dict,
+        similar_contents,
+    ):
+        preferred_embedding = self.contents_embedding[preferred_content]
+        for other_content, embedding in popular_content_embeddings_dict.items():
+            if other_content not in preferred_contents:
+                similarity = np.dot(preferred_embedding, embedding) / (
+                    np.linalg.norm(preferred_embedding) * np.linalg.norm(embedding)
+                )
+                if other_content not in similar_contents:
+                    similar_contents[other_content] = 0
+                similar_contents[other_content] += similarity
+
     async def calculate_score(
         self, recommendations, filtered_content_ids, weight, combined_recommendations
     ):
@@ -0,0 +1,101 @@
+import hashlib
+import json
+
+import numpy as np
+
+
+# 콘텐츠별 상위 K개 이웃과 유사도를 CSR 형태로 저장하는 테이블
+# indptr[i]:indptr[i + 1] 구간의 indices/scores 가 titles[i] 의 이웃이다
+class NeighborTable:
+    def __init__(self, titles, indptr, indices, scores, fingerprint=None):
+        self.titles = titles
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self.fingerprint = fingerprint
+        self.title_index = {title: i for i, title in enumerate(titles)}
+
+    def __contains__(self, title):
+        return title in self.title_index
+
+    def neighbors(self, title):
+        row = self.title_index[title]
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.titles[self.indices[start:end]], self.scores[start:end]
+
+    def save(self, path):
+        np.savez(
+            path,
+            titles=np.asarray(self.titles, dtype=str),
+            indptr=self.indptr,
+            indices=self.indices,
+            scores=self.scores,
+            fingerprint=np.asarray(json.dumps(self.fingerprint)),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            fingerprint = json.loads(str(data["fingerprint"])) if "fingerprint" in data else None
+            return cls(
+                data["titles"], data["indptr"], data["indices"], data["scores"], fingerprint
+            )
+
+
+def table_fingerprint(contents_embedding, candidate_titles, top_k):
+    # 테이블을 만든 임베딩, 인기 콘텐츠 목록, top_k 가 현재와 같은지 확인하기 위한 값
+    embedding_hash = hashlib.sha256()
+    for title, embedding in contents_embedding.items():
+        embedding_hash.update(title.encode("utf-8"))
+        embedding_hash.update(np.asarray(embedding, dtype=np.float32).tobytes())
+    candidate_hash = hashlib.sha256("\n".join(sorted(candidate_titles)).encode("utf-8"))
+    return {
+        "title_count": len(contents_embedding),
+        "embedding_hash": embedding_hash.hexdigest(),
+        "candidate_hash": candidate_hash.hexdigest(),
+        "top_k": top_k,
+    }
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def build_neighbor_table(contents_embedding, candidate_titles, top_k=200, batch_size=1024):
+    # 모든 콘텐츠를 행으로, 후보(인기) 콘텐츠 중 코사인 유사도 상위 top_k 를 이웃으로 저장한다
+    candidate_titles = list(candidate_titles)
+    titles = list(contents_embedding.keys())
+    title_index = {title: i for i, title in enumerate(titles)}
+    candidate_rows = np.array(
+        [title_index[title] for title in candidate_titles if title in title_index], dtype=np.int32
+    )
+
+    embeddings = _normalize_rows(
+        np.vstack([np.asarray(contents_embedding[title], dtype=np.float32) for title in titles])
+    )
+    candidate_embeddings = embeddings[candidate_rows]
+    k = min(top_k, len(candidate_rows))
+
+    indptr = np.zeros(len(titles) + 1, dtype=np.int64)
+    indices, scores = [], []
+    for start in range(0, len(titles), batch_size):
+        similarities = embeddings[start : start + batch_size] @ candidate_embeddings.T
+        for offset, row in enumerate(similarities):
+            # 자기 자신은 추천 대상에서 항상 제외되므로 이웃에서도 뺀다
+            row[candidate_rows == start + offset] = -np.inf
+            top = np.argpartition(-row, k - 1)[:k] if k else np.array([], dtype=np.int64)
+            top = top[np.isfinite(row[top])]
+            top = top[np.argsort(-row[top])]
+            indices.append(candidate_rows[top])
+            scores.append(row[top])
+            indptr[start + offset + 1] = indptr[start + offset] + len(top)
+
+    return NeighborTable(
+        np.asarray(titles, dtype=str),
+        indptr,
+        np.concatenate(indices).astype(np.int32) if indices else np.array([], dtype=np.int32),
+        np.concatenate(scores).astype(np.float32) if scores else np.array([], dtype=np.float32),
+        table_fingerprint(contents_embedding, candidate_titles, top_k),
+    )
@@ -46,11 +46,35 @@ async def save_recommendation_to_db(recommend_orm, get_db):
         break  # To exit the async generator
 
 
-async def process_recommendations(
-    recommender_input: dict,
-    background_tasks: BackgroundTasks,
-    re_recommend=False,
-):
+# 동일한 입력으로 동시에 들어온 추천 요청을 하나의 계산으로 합치기 위한 in-flight 테이블
+_inflight_recommendations: dict = {}
+singleflight_stats = {"computed": 0, "coalesced": 0, "bypassed": 0}
+
+
+def get_singleflight_stats() -> dict:
+    return {**singleflight_stats, "inflight": len(_inflight_recommendations)}
+
+
+def _singleflight_key(recommender_input: dict):
+    # MBTI, 입력 타이틀, 이전 추천 목록을 정규화해서 키로 사용한다
+    # 클라이언트 값은 타입이 섞여 있을 수 있으므로 repr 로 바꿔서 정렬하고,
+    # 키를 만들 수 없는 입력은 None 을 반환해서 합치지 않고 바로 계산한다
+    # input_media_title 이 없는(None) 요청은 계산이 실패하므로 [] 와 같은 키로 합치면 안 된다
+    user_mbti = recommender_input.get("user_mbti")
+    input_media_title = recommender_input.get("input_media_title")
+    previous_recommendations = recommender_input.get("previous_recommendations") or []
+    if not isinstance(user_mbti, str) or not all(
+        isinstance(values, list) for values in (input_media_title, previous_recommendations)
+    ):
+        return None
+    return (
+        user_mbti.upper(),
+        tuple(sorted(map(repr, input_media_title))),
+        tuple(sorted(map(repr, previous_recommendations))),
+    )
+
+
+async def compute_recommendations(recommender_input: dict):
     result, re_recommend = await recommend_helper.get_recommendations(
         recommender_input=recommender_input
     )
@@ -59,6 +83,39 @@ async def process_recommendations(
     recommend_cursor = get_recommendations_with_details(result)
 
     input_media_id_list, recommend_list = await asyncio.gather(input_media_cursor, recommend_cursor)
+    return re_recommend, input_media_id_list, recommend_list
+
+
+def _finish_singleflight(key, task):
+    _inflight_recommendations.pop(key, None)
+    # 기다리던 요청이 모두 취소된 경우에도 "Task exception was never retrieved" 가 남지 않도록 읽어둔다
+    if not task.cancelled():
+        task.exception()
+
+
+async def compute_recommendations_singleflight(recommender_input: dict):
+    if (key := _singleflight_key(recommender_input)) is None:
+        singleflight_stats["bypassed"] += 1
+        return await compute_recommendations(recommender_input)
+    if (task := _inflight_recommendations.get(key)) is not None:
+        singleflight_stats["coalesced"] += 1
+    else:
+        singleflight_stats["computed"] += 1
+        task = asyncio.ensure_future(compute_recommendations(recommender_input))
+        _inflight_recommendations[key] = task
+        task.add_done_callback(lambda done: _finish_singleflight(key, done))
+    # 한 요청이 취소되더라도 같은 계산을 기다리는 다른 요청에는 영향이 없도록 shield 한다
+    return await asyncio.shield(task)
+
+
+async def process_recommendations(
+    recommender_input: dict,
+    background_tasks: BackgroundTasks,
+    re_recommend=False,
+):
+    re_recommend, input_media_id_list, recommend_list = await compute_recommendations_singleflight(
+        recommender_input
+    )
     if recommender_input.get("user_id"):
         recommend_orm = RecommendORM(
             user_id=recommender_input["user_id"],
@@ -69,4 +126,4 @@ async def process_recommendations(
         )
         background_tasks.add_task(save_recommendation_to_db, recommend_orm, mysql_conn.get_db)
 
-    return recommend_list
+    return list(recommend_list)